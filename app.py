@@ -1,9 +1,9 @@
 import streamlit as st
 import os
-from dotenv import load_dotenv
+from utils.helpers import load_env
 
 # Initialize environment variables
-load_dotenv()
+load_env("DATABASE_URL", "OPENAI_API_KEY")
 
 # Streamlit Page Config
 st.set_page_config(
@@ -0,0 +1,6 @@
+-- Trigram index so `student_name ILIKE '%q%'` (Explore name search) is an
+-- index scan instead of a sequential scan.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS alumni_internal_name_trgm
+    ON alumni_internal USING gin (student_name gin_trgm_ops);
@@ -0,0 +1,8 @@
+-- Lookup indexes on the identity map. Admin Tools' unmapped checks are
+-- NOT EXISTS anti-joins against these columns, and Explore / AI Search
+-- join through the map on both ids.
+CREATE INDEX IF NOT EXISTS idx_map_linkedin
+    ON alumni_identity_map (linkedin_id);
+
+CREATE INDEX IF NOT EXISTS idx_map_internal
+    ON alumni_identity_map (internal_id);
@@ -0,0 +1,6 @@
+-- Trigram index for the Add/Edit typeahead, which matches the search term
+-- against roll_no as well as student_name (see 001 for the name index).
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS alumni_internal_roll_no_trgm
+    ON alumni_internal USING gin (roll_no gin_trgm_ops);
@@ -0,0 +1,70 @@
+-- Precomputed Admin Tools checks. The page reads these views (falling back
+-- to live queries if they don't exist) and its "Refresh now" button calls
+-- refresh_data_quality_views(); with pg_cron installed they are also
+-- refreshed hourly. Plain (non-CONCURRENTLY) refresh: the duplicate views
+-- cannot carry the unique index CONCURRENTLY requires, and they are small.
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_unmapped_linkedin AS
+    SELECT e.* FROM alumni_external_linkedin e
+    WHERE NOT EXISTS (SELECT 1 FROM alumni_identity_map m WHERE m.linkedin_id = e.linkedin_id);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_unmapped_internal AS
+    SELECT ai.* FROM alumni_internal ai
+    WHERE NOT EXISTS (SELECT 1 FROM alumni_identity_map m WHERE m.internal_id = ai.internal_id);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_missing_fields AS
+    SELECT internal_id, student_name AS name, batch, issues
+    FROM (
+        SELECT internal_id, student_name, batch,
+               concat_ws(', ',
+                   CASE WHEN coalesce(btrim(student_name::text), '') = '' THEN 'Missing Name' END,
+                   CASE WHEN coalesce(btrim(batch::text), '') = '' THEN 'Missing Batch' END,
+                   CASE WHEN coalesce(btrim(college_email::text), '') = ''
+                         AND coalesce(btrim(personal_email::text), '') = '' THEN 'No Email' END,
+                   CASE WHEN coalesce(btrim(mobile_no::text), '') = ''
+                         AND coalesce(btrim(whatsapp_no::text), '') = '' THEN 'No Phone Number' END
+               ) AS issues
+        FROM alumni_internal
+    ) t
+    WHERE issues <> '';
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_duplicate_linkedin AS
+    SELECT * FROM alumni_external_linkedin
+    WHERE linkedin_id IN (
+        SELECT linkedin_id FROM alumni_external_linkedin
+        GROUP BY linkedin_id HAVING count(*) > 1
+    );
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_duplicate_internal AS
+    SELECT * FROM (
+        SELECT ai.*, count(*) OVER (PARTITION BY student_name, batch) AS dup_count
+        FROM alumni_internal ai
+    ) t
+    WHERE dup_count > 1
+    ORDER BY student_name, batch;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_stats AS
+    SELECT
+        (SELECT count(*) FROM alumni_internal) AS n_internal,
+        (SELECT count(*) FROM alumni_external_linkedin) AS n_external,
+        (SELECT count(*) FROM alumni_identity_map) AS n_map;
+
+CREATE OR REPLACE FUNCTION refresh_data_quality_views() RETURNS void
+LANGUAGE plpgsql AS $$
+BEGIN
+    REFRESH MATERIALIZED VIEW mv_unmapped_linkedin;
+    REFRESH MATERIALIZED VIEW mv_unmapped_internal;
+    REFRESH MATERIALIZED VIEW mv_missing_fields;
+    REFRESH MATERIALIZED VIEW mv_duplicate_linkedin;
+    REFRESH MATERIALIZED VIEW mv_duplicate_internal;
+    REFRESH MATERIALIZED VIEW mv_stats;
+END $$;
+
+-- Hourly refresh when pg_cron is available (re-scheduling by name updates the job)
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_cron') THEN
+        PERFORM cron.schedule('refresh-data-quality-views', '0 * * * *',
+                              'SELECT refresh_data_quality_views()');
+    END IF;
+END $$;
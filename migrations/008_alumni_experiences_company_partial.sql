@@ -0,0 +1,7 @@
+-- Partial covering index for Explore's experience load, which reads only
+-- (alumni_id, company_name) for rows with a non-empty company. Blank
+-- company rows are left out, so the index stays small and the load can
+-- be an index-only scan instead of reading the whole table.
+CREATE INDEX IF NOT EXISTS alumni_experiences_company_nonempty
+    ON alumni_experiences (company_name, alumni_id)
+    WHERE company_name <> '';
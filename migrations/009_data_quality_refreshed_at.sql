@@ -0,0 +1,12 @@
+-- Record when the data-quality views (007) were last refreshed: mv_stats
+-- gets a refreshed_at column, evaluated by every refresh, which Admin
+-- Tools shows next to the checks. Recreated in place, so re-running is safe;
+-- refresh_data_quality_views() refers to it by name and needs no change.
+DROP MATERIALIZED VIEW IF EXISTS mv_stats;
+
+CREATE MATERIALIZED VIEW mv_stats AS
+    SELECT
+        (SELECT count(*) FROM alumni_internal) AS n_internal,
+        (SELECT count(*) FROM alumni_external_linkedin) AS n_external,
+        (SELECT count(*) FROM alumni_identity_map) AS n_map,
+        now() AS refreshed_at;
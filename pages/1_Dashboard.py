@@ -1,7 +1,7 @@
 import streamlit as st
 import pandas as pd
 import altair as alt
-from utils.db import fetch_df
+from utils.cache import fetch_many, top_n_sql
 
 st.set_page_config(layout="wide")
 
@@ -15,142 +15,176 @@ st.markdown(
 
 
 # ----------------------------------------------------
-# LOAD DATA (safe)
+# LOAD DATA (safe) — counts & top-N are aggregated in Postgres,
+# and all five queries are issued concurrently
 # ----------------------------------------------------
-def safe_fetch(q):
-    try:
-        return fetch_df(q)
-    except Exception as e:
-        st.error(f"Data load failed: {e}")
+loaded = fetch_many({
+    "counts": """
+        SELECT
+            (SELECT count(*) FROM alumni_internal) AS internal,
+            (SELECT count(*) FROM alumni_external_linkedin) AS external,
+            (SELECT count(*) FROM alumni_identity_map) AS mapped,
+            (SELECT count(DISTINCT internal_id) FROM alumni_identity_map) AS mapped_internal,
+            (SELECT count(*) FROM alumni_experiences) AS experiences
+    """,
+    "batch": top_n_sql("alumni_internal", "batch", 20),
+    "skills": top_n_sql("alumni_skills", "skill_name", 15),
+    "companies": top_n_sql("alumni_experiences", "company_name", 15),
+    "cities": top_n_sql("alumni_external_linkedin", "city", 10),
+})
+
+
+def safe_result(key):
+    df = loaded[key]
+    if isinstance(df, Exception):
+        st.error(f"Data load failed: {df}")
         return pd.DataFrame()
+    return df
 
 
-# Load datasets
-df_internal = safe_fetch("SELECT * FROM alumni_internal")
-df_external = safe_fetch("SELECT * FROM alumni_external_linkedin")
-df_map = safe_fetch("SELECT * FROM alumni_identity_map")
-df_experience = safe_fetch("SELECT * FROM alumni_experiences")
-df_skills = safe_fetch("SELECT * FROM alumni_skills")
+def safe_top_n(key, labels):
+    """Top-n value counts renamed to `labels`; empty (with a warning) if the query failed."""
+    df = loaded[key]
+    if isinstance(df, Exception):
+        st.warning(f"Could not load {labels[0].lower()} breakdown: {df}")
+        return pd.DataFrame()
+    if not df.empty:
+        df = df.copy()
+        df.columns = labels
+    return df
 
 
-# ----------------------------------------------------
-# KPIs
-# ----------------------------------------------------
-col1, col2, col3, col4 = st.columns(4)
+def count_of(counts, key):
+    if counts.empty or key not in counts.columns:
+        return 0
+    return int(counts[key].iat[0] or 0)
 
-col1.metric("Total Internal Alumni", int(len(df_internal)))
-col2.metric("LinkedIn Profiles Scraped", int(len(df_external)))
-col3.metric("Profiles Mapped", f"{int(len(df_map))}")
-col4.metric("Experience Records", int(len(df_experience)))
 
-st.markdown("---")
+counts = safe_result("counts")
+batch_df = safe_top_n("batch", ["Batch", "Count"])
+top_skills = safe_top_n("skills", ["Skill", "Count"])
+company_df = safe_top_n("companies", ["Company", "Count"])
+city_df = safe_top_n("cities", ["city", "count"])
 
 
 # ----------------------------------------------------
-# MAPPING STATUS (simple)
+# SECTIONS — each one is a fragment, so a rerun triggered inside a
+# section only re-renders that section
 # ----------------------------------------------------
-st.subheader("🔗 Mapping Status")
-if df_internal.empty:
-    st.info("No internal alumni data available.")
-else:
-    mapped_internal_ids = set(df_map.get("internal_id", [])) if not df_map.empty else set()
-    mapped = len(mapped_internal_ids)
-    unmapped = len(df_internal) - mapped
+@st.fragment
+def render_kpis(counts):
+    col1, col2, col3, col4 = st.columns(4)
+
+    col1.metric("Total Internal Alumni", count_of(counts, "internal"))
+    col2.metric("LinkedIn Profiles Scraped", count_of(counts, "external"))
+    col3.metric("Profiles Mapped", f"{count_of(counts, 'mapped')}")
+    col4.metric("Experience Records", count_of(counts, "experiences"))
+
+
+@st.fragment
+def render_mapping_status(counts):
+    st.subheader("🔗 Mapping Status")
+    if count_of(counts, "internal") == 0:
+        st.info("No internal alumni data available.")
+        return
+    mapped = count_of(counts, "mapped_internal")
+    unmapped = count_of(counts, "internal") - mapped
 
     status_df = pd.DataFrame({"Status": ["Mapped", "Unmapped"], "Count": [mapped, unmapped]})
     pie = alt.Chart(status_df).mark_arc().encode(theta="Count", color="Status")
     st.altair_chart(pie, use_container_width=True)
 
-# ----------------------------------------------------
-# VISUALS: Batch distribution, Top Skills, Top Companies, City distribution
-# Use Altair charts for manager-friendly visuals
-# ----------------------------------------------------
-st.subheader("🎓 Batch Distribution (Top 20)")
-if "batch" in df_internal.columns and not df_internal.empty:
-    batch_df = df_internal['batch'].value_counts().head(20).reset_index()
-    batch_df.columns = ["Batch", "Count"]
+
+@st.fragment
+def render_batch(batch_df):
+    st.subheader("🎓 Batch Distribution (Top 20)")
+    if batch_df.empty:
+        st.info("Batch data not available.")
+        return
     chart_batch = alt.Chart(batch_df).mark_bar().encode(
         x=alt.X('Batch:N', sort='-y'),
         y='Count:Q',
         tooltip=['Batch', 'Count']
     )
     st.altair_chart(chart_batch, use_container_width=True)
-else:
-    st.info("Batch data not available.")
 
-st.subheader("💡 Top Skills (Top 15)")
-if not df_skills.empty and 'skill_name' in df_skills.columns:
-    top_skills = df_skills['skill_name'].value_counts().head(15).reset_index()
-    top_skills.columns = ["Skill", "Count"]
+
+@st.fragment
+def render_skills(top_skills):
+    st.subheader("💡 Top Skills (Top 15)")
+    if top_skills.empty:
+        st.info("Skills data not available.")
+        return
     skill_chart = alt.Chart(top_skills).mark_bar().encode(
         x='Count:Q',
         y=alt.Y('Skill:N', sort='-x'),
         tooltip=['Skill', 'Count']
     )
     st.altair_chart(skill_chart, use_container_width=True)
-else:
-    st.info("Skills data not available.")
 
-st.subheader("🏢 Top Companies (Top 15)")
-if not df_experience.empty and 'company_name' in df_experience.columns:
-    company_df = df_experience['company_name'].value_counts().head(15).reset_index()
-    company_df.columns = ["Company", "Count"]
+
+@st.fragment
+def render_companies(company_df):
+    st.subheader("🏢 Top Companies (Top 15)")
+    if company_df.empty:
+        st.info("Experience/company data not available.")
+        return
     chart_comp = alt.Chart(company_df).mark_bar().encode(
         x='Count:Q',
         y=alt.Y('Company:N', sort='-x'),
         tooltip=['Company', 'Count']
     )
     st.altair_chart(chart_comp, use_container_width=True)
-else:
-    st.info("Experience/company data not available.")
 
-st.subheader("🌍 City Distribution (Top 10)")
-if not df_external.empty and 'city' in df_external.columns:
-    city_df = df_external['city'].value_counts().head(10).reset_index()
-    city_df.columns = ["city", "count"]
+
+@st.fragment
+def render_cities(city_df):
+    st.subheader("🌍 City Distribution (Top 10)")
+    if city_df.empty:
+        st.info("City data not available.")
+        return
     city_chart = alt.Chart(city_df).mark_bar().encode(
         x='count:Q',
         y=alt.Y('city:N', sort='-x'),
         tooltip=['city', 'count']
     )
     st.altair_chart(city_chart, use_container_width=True)
-else:
-    st.info("City data not available.")
+
+
+@st.fragment
+def render_summary_table(title, df, empty_msg):
+    # Reuses the aggregates above — no extra queries
+    st.subheader(title)
+    if df.empty:
+        st.info(empty_msg)
+    else:
+        st.table(df.head(10))
 
 
 # ----------------------------------------------------
-# Top metrics and distributions (manager friendly)
+# LAYOUT
 # ----------------------------------------------------
-col_a, col_b = st.columns(2)
+render_kpis(counts)
+st.markdown("---")
 
-with col_a:
-    st.subheader("🎓 Batch Distribution (Top)")
-    if "batch" in df_internal.columns and not df_internal.empty:
-        batch_df = df_internal['batch'].value_counts().head(10).reset_index()
-        batch_df.columns = ["Batch", "Count"]
-        st.table(batch_df)
-    else:
-        st.info("Batch data not available.")
+render_mapping_status(counts)
 
-with col_b:
-    st.subheader("💡 Top Skills (Summary)")
-    if not df_skills.empty and 'skill_name' in df_skills.columns:
-        top_skills = df_skills['skill_name'].value_counts().head(10).reset_index()
-        top_skills.columns = ["Skill", "Count"]
-        st.table(top_skills)
-    else:
-        st.info("Skills data not available.")
+# VISUALS: Batch distribution, Top Skills, Top Companies, City distribution
+render_batch(batch_df)
+render_skills(top_skills)
+render_companies(company_df)
+render_cities(city_df)
 
+# Top metrics and distributions (manager friendly)
+col_a, col_b = st.columns(2)
+with col_a:
+    render_summary_table("🎓 Batch Distribution (Top)", batch_df, "Batch data not available.")
+with col_b:
+    render_summary_table("💡 Top Skills (Summary)", top_skills, "Skills data not available.")
 
 st.markdown("---")
 
-st.subheader("🏢 Top Companies (from experience)")
-if not df_experience.empty and 'company_name' in df_experience.columns:
-    company_df = df_experience['company_name'].value_counts().head(10).reset_index()
-    company_df.columns = ["Company", "Count"]
-    st.table(company_df)
-else:
-    st.info("Experience/company data not available.")
+render_summary_table("🏢 Top Companies (from experience)", company_df, "Experience/company data not available.")
 
 
 # FOOTER
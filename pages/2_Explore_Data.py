@@ -1,19 +1,7 @@
 import streamlit as st
 import pandas as pd
-from utils.db import fetch_df
-import io
-
-# Excel writer engine detection
-EXCEL_ENGINE = None
-try:
-    import xlsxwriter  # type: ignore
-    EXCEL_ENGINE = "xlsxwriter"
-except Exception:
-    try:
-        import openpyxl  # type: ignore
-        EXCEL_ENGINE = "openpyxl"
-    except Exception:
-        EXCEL_ENGINE = None
+from utils.cache import cached_fetch, distinct
+from utils.export import to_csv_bytes, to_excel_bytes
 
 # Optional AG-Grid support: provide graceful fallback if package not installed
 try:
@@ -22,13 +10,9 @@ try:
 except Exception:
     HAS_AGGRID = False
 
-st.set_page_config(layout="wide")
+# Rows sent to AG-Grid per page (the grid serializes everything it is given)
+GRID_PAGE_SIZE = 25
 
-# ----------------------------------------------------
-# HEADER
-# ----------------------------------------------------
-st.title("📊 Explore Alumni Data")
-st.markdown("Filter, search, and export alumni data with AG-Grid.")
 st.set_page_config(layout="wide")
 
 # ----------------------------------------------------
@@ -42,65 +26,127 @@ st.markdown(
 st.divider()
 
 # Load data safely
-def safe_fetch(q):
+def safe_fetch(q, params=None):
     try:
-        return fetch_df(q)
+        return cached_fetch(q, params)
     except Exception as e:
         st.error(f"Data load failed: {e}")
         return pd.DataFrame()
 
 
-df_internal = safe_fetch("SELECT * FROM alumni_internal")
-df_external = safe_fetch("SELECT * FROM alumni_external_linkedin")
-df_map = safe_fetch("SELECT * FROM alumni_identity_map")
-exp_df = safe_fetch("SELECT * FROM alumni_experiences")
+# Low-cardinality text columns: category dtype makes value_counts/nunique/isin
+# work on integer codes instead of hashing Python strings row by row
+CATEGORY_COLS = ("batch", "city", "company_name", "skill_name")
+
+
+def as_categories(frame):
+    for col in CATEGORY_COLS:
+        if col in frame.columns:
+            frame[col] = frame[col].astype("category")
+    return frame
+
+
+def merge_alumni(df_internal, df_map, df_external):
+    """
+    Merge internal -> mapping -> external as one left-join chain.
+    Unmapped alumni keep a NaN linkedin_id and simply get no external fields.
+    Missing values stay NaN (numeric columns keep their dtype); blanks are
+    only rendered at display time.
+    """
+    df = df_internal
+    if not df.empty and not df_map.empty and 'internal_id' in df.columns:
+        df = df.merge(df_map, on="internal_id", how="left")
+
+    if not df_external.empty and 'linkedin_id' in df.columns:
+        df = df.merge(df_external, on='linkedin_id', how='left', suffixes=('_int', '_ext'))
+
+    return as_categories(df)
+
+
+# Only the columns the filters and Manager View read; the full-width rows
+# are loaded by load_records() when a table or export needs them
+df_internal = safe_fetch("SELECT internal_id, batch FROM alumni_internal")
+df_external = safe_fetch("SELECT linkedin_id, city FROM alumni_external_linkedin")
+df_map = safe_fetch("SELECT internal_id, linkedin_id FROM alumni_identity_map")
+exp_df = as_categories(safe_fetch("SELECT alumni_id, company_name FROM alumni_experiences WHERE company_name <> ''"))
+
+df = merge_alumni(df_internal, df_map, df_external)
 
-# Merge internal + external via mapping when possible
-if not df_internal.empty and not df_map.empty:
+
+def ids_param(ids):
+    """Sorted plain-Python list of ids for an = ANY(%s) parameter."""
+    return sorted(pd.Series(ids).dropna().unique().tolist(), key=str)
+
+
+def load_records(internal_ids=None):
+    """
+    All internal + LinkedIn columns for the given internal_ids (only those
+    rows are read), or for every alumnus if internal_ids is None.
+    """
+    if internal_ids is None:
+        return merge_alumni(
+            safe_fetch("SELECT * FROM alumni_internal"),
+            df_map,
+            safe_fetch("SELECT * FROM alumni_external_linkedin"),
+        )
+    ids = ids_param(internal_ids)
+    if not ids:
+        return pd.DataFrame()
+    df_int = safe_fetch("SELECT * FROM alumni_internal WHERE internal_id = ANY(%s)", (ids,))
+    linkedin_ids = []
+    if not df_map.empty:
+        linkedin_ids = ids_param(df_map.loc[df_map["internal_id"].isin(ids), "linkedin_id"])
+    df_ext = (
+        safe_fetch("SELECT * FROM alumni_external_linkedin WHERE linkedin_id = ANY(%s)", (linkedin_ids,))
+        if linkedin_ids else pd.DataFrame()
+    )
+    return merge_alumni(df_int, df_map, df_ext)
+
+# Filter options come from cached SELECT DISTINCT queries, not the full frame
+def safe_distinct(table, col):
     try:
-        df = df_map.merge(df_internal, left_on="internal_id", right_on="internal_id", how="left")
+        return distinct(table, col)
     except Exception:
-        df = df_internal.copy()
-else:
-    df = df_internal.copy()
-
-if not df_external.empty and 'linkedin_id' in df.columns:
-    df = df.merge(df_external, left_on='linkedin_id', right_on='linkedin_id', how='left', suffixes=('_int', '_ext'))
+        return []
 
-df.fillna("", inplace=True)
 
 # Sidebar filters
 st.sidebar.header("🔍 Filters")
 view_mode = st.sidebar.radio("View Mode", ["Manager View", "Data View"]) 
-# Build safe, clean filter lists (drop nulls, cast to str)
-batch_vals = df.get("batch", pd.Series(dtype=str)).dropna().astype(str).unique().tolist()
-batch_vals = sorted([b for b in batch_vals if b and b.strip()])
-batch_filter = st.sidebar.multiselect("Batch", batch_vals)
+batch_filter = st.sidebar.multiselect("Batch", safe_distinct("alumni_internal", "batch"))
 
 # City filter
-city_vals = df.get("city", pd.Series(dtype=str)).dropna().astype(str).unique().tolist()
-city_vals = sorted([c for c in city_vals if c and c.strip()])
-city_filter = st.sidebar.multiselect("City", city_vals)
+city_filter = st.sidebar.multiselect("City", safe_distinct("alumni_external_linkedin", "city"))
 
 # Company filter (from experience table)
-exp_df = fetch_df("SELECT * FROM alumni_experiences WHERE company_name <> ''")
-company_vals = exp_df.get("company_name", pd.Series(dtype=str)).dropna().astype(str).unique().tolist() if not exp_df.empty else []
-company_vals = sorted([c for c in company_vals if c and c.strip()])
-company_filter = st.sidebar.multiselect("Company (Experience)", company_vals)
+company_filter = st.sidebar.multiselect("Company (Experience)", safe_distinct("alumni_experiences", "company_name"))
 name_search = st.sidebar.text_input("Name Contains")
 
 # Apply filters
 df_filtered = df.copy()
 if batch_filter:
-    df_filtered = df_filtered[df_filtered["batch"].isin(batch_filter)]
+    df_filtered = df_filtered[df_filtered["batch"].astype(str).isin(batch_filter)]
 if city_filter:
-    df_filtered = df_filtered[df_filtered["city"].isin(city_filter)]
+    df_filtered = df_filtered[df_filtered["city"].astype(str).isin(city_filter)]
 if name_search.strip():
-    df_filtered = df_filtered[df_filtered["student_name"].str.contains(name_search, case=False, na=False)]
+    # Substring match runs in Postgres (pg_trgm index, see migrations/)
+    name_matches = safe_fetch(
+        "SELECT internal_id FROM alumni_internal WHERE student_name ILIKE %s",
+        (f"%{name_search.strip()}%",)
+    )
+    matched_ids = name_matches["internal_id"] if not name_matches.empty else []
+    df_filtered = df_filtered[df_filtered["internal_id"].isin(matched_ids)]
 if company_filter and not exp_df.empty:
     internal_ids_from_company = exp_df[exp_df["company_name"].isin(company_filter)]["alumni_id"].unique()
     df_filtered = df_filtered[df_filtered["internal_id"].isin(internal_ids_from_company)]
 
+# Ids of the filtered alumni for load_records(); None (= everyone) while no
+# filter is active, so the unfiltered view is a plain SELECT with no id list
+filters_active = bool(batch_filter or city_filter or name_search.strip() or company_filter)
+selected_ids = None
+if filters_active:
+    selected_ids = ids_param(df_filtered["internal_id"]) if "internal_id" in df_filtered.columns else []
+
 # Manager View: aggregations
 if view_mode == "Manager View":
     st.subheader("Manager Summary")
@@ -123,7 +169,7 @@ if view_mode == "Manager View":
         st.info("No experience/company data available.")
 
     st.subheader("Top 10 Skills")
-    skills_df = safe_fetch("SELECT skill_name FROM alumni_skills")
+    skills_df = as_categories(safe_fetch("SELECT skill_name FROM alumni_skills"))
     if not skills_df.empty and 'skill_name' in skills_df.columns:
         top_sk = skills_df['skill_name'].value_counts().head(10).reset_index()
         top_sk.columns = ['Skill', 'Count']
@@ -132,17 +178,29 @@ if view_mode == "Manager View":
         st.info("No skills data available.")
 
 else:
-    # Data View: show table with AG-Grid if available, otherwise show simple table
+    # Data View: native st.dataframe (Arrow + virtual scrolling) by default.
+    # AG-Grid is opt-in and only ever receives one page of rows.
     st.subheader("📋 Alumni Records")
-    if HAS_AGGRID:
-        gb = GridOptionsBuilder.from_dataframe(df_filtered)
-        gb.configure_default_column(filter=True, sortable=True, resizable=True, editable=False)
-        gb.configure_pagination(enabled=True, paginationPageSize=25)
+    df_records = load_records(selected_ids) if "internal_id" in df_filtered.columns else df_filtered
+    use_grid = HAS_AGGRID and st.checkbox("Use interactive grid (AG-Grid, paged)", value=False)
+    if use_grid:
+        page_count = max(1, -(-len(df_records) // GRID_PAGE_SIZE))
+        page = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1)
+        start = (int(page) - 1) * GRID_PAGE_SIZE
+        df_page = df_records.iloc[start:start + GRID_PAGE_SIZE]
+        if not df_page.empty:
+            st.caption(f"Rows {start + 1}–{start + len(df_page)} of {len(df_records)}")
+
+        gb = GridOptionsBuilder.from_dataframe(df_page)
+        gb.configure_default_column(
+            filter=True, sortable=True, resizable=True, editable=False,
+            valueFormatter="value == null ? '' : value",
+        )
         gb.configure_side_bar()
         gb.configure_selection("multiple")
         grid_options = gb.build()
         grid_response = AgGrid(
-            df_filtered,
+            df_page,
             gridOptions=grid_options,
             height=600,
             width="100%",
@@ -154,31 +212,42 @@ else:
         if selected:
             st.success(f"Selected {len(selected)} rows")
     else:
-        st.info("`st-aggrid` not installed — displaying a simple table. Install `streamlit-aggrid` for a richer table UI.")
-        st.dataframe(df_filtered)
+        st.dataframe(df_records, use_container_width=True, height=600)
+
+# Export — a fragment, so export clicks rerun only this block, and the
+# CSV / Excel files are only built when asked for. In Manager View the
+# full-width rows are not loaded at all until an export is requested.
+# "Prepared" is kept in session_state (a button is only True for the one
+# rerun right after its click) together with the filtered id set it was
+# prepared for, so changing a filter un-prepares it.
+@st.fragment
+def render_export(internal_ids, df_export=None):
+    st.markdown("---")
+    st.subheader("📤 Export")
+    export_key = "all" if internal_ids is None else hash(tuple(internal_ids))
+    if st.button("Prepare export"):
+        st.session_state["export_ready"] = export_key
+    if st.session_state.get("export_ready") != export_key:
+        return
+    if df_export is None:
+        df_export = load_records(internal_ids)
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button("Download CSV", to_csv_bytes(df_export), file_name="alumni_export.csv", mime="text/csv")
+    with col2:
+        if st.button("Prepare Excel"):
+            st.session_state["excel_ready"] = export_key
+        if st.session_state.get("excel_ready") == export_key:
+            try:
+                st.download_button("Download Excel", to_excel_bytes(df_export, sheet_name='Alumni'), file_name="alumni_export.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+            except Exception:
+                st.info("Excel export not available in this environment. Install XlsxWriter or openpyxl.")
 
-# Export
-st.markdown("---")
-st.subheader("📤 Export")
-col1, col2 = st.columns(2)
-with col1:
-    st.download_button("Download CSV", df_filtered.to_csv(index=False).encode("utf-8"), file_name="alumni_export.csv", mime="text/csv")
-with col2:
-    try:
-        import io
-        from pandas import ExcelWriter
-        output = io.BytesIO()
-        with ExcelWriter(output, engine=(EXCEL_ENGINE or 'openpyxl')) as writer:
-            df_filtered.to_excel(writer, index=False, sheet_name='Alumni')
-        st.download_button("Download Excel", output.getvalue(), file_name="alumni_export.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
-    except Exception:
-        st.info("Excel export not available in this environment. Install XlsxWriter or openpyxl.")
 
-st.markdown("---")
-st.caption("Explore data in Manager or Data views. Use filters to focus the dataset and export for reporting.")
+render_export(selected_ids, df_records if view_mode == "Data View" else None)
 
 # ----------------------------------------------------
 # FOOTER
 # ----------------------------------------------------
 st.markdown("---")
-st.caption("Explore & export alumni data with filters and AG-Grid.")
+st.caption("Explore data in Manager or Data views. Use filters to focus the dataset and export for reporting.")
@@ -1,7 +1,8 @@
 import streamlit as st
 import pandas as pd
 from utils.db import fetch_df, vector_search, get_table_columns
-from utils.ai_utils import get_embedding, embedding_to_pgvector, summarize_profile, interpret_query
+from utils.ai_utils import embedding_to_pgvector
+from utils.cache import cached_embedding, cached_embeddings, cached_interpret_query, fetch_many, summarize_many, summary_or_error
 from utils.helpers import sanitize, safe_join
 
 st.set_page_config(layout="wide")
@@ -25,6 +26,17 @@ st.divider()
 # ----------------------------------------------------
 query = st.text_input("Ask your query:", placeholder="e.g. Find alumni with product management experience in Bangalore")
 
+# Vector search tuning: larger ef_search = better recall, slower search
+st.sidebar.header("⚙️ Search Settings")
+ef_search = st.sidebar.slider(
+    "HNSW ef_search", min_value=10, max_value=400, value=100, step=10,
+    help="Candidates the vector index examines per query. Raise for better recall on filtered (hybrid) searches."
+)
+
+cache_stats = st.session_state.get("cache_stats", {})
+for kind, counts in cache_stats.items():
+    st.sidebar.caption(f"Cache {kind}: {counts['hits']} hits / {counts['misses']} misses")
+
 if not query:
     st.stop()
 
@@ -32,42 +44,49 @@ if not query:
 # AI ROUTER (SQL / VECTOR / HYBRID DECISION)
 # ----------------------------------------------------
 with st.spinner("Interpreting your query..."):
-    route = interpret_query(query)
+    route = cached_interpret_query(query)
 
 mode = route.get("mode", "vector")
-sql_filters = route.get("sql_filters", {})
+sql_filters = route.get("sql_filters") or {}
+if not isinstance(sql_filters, dict):
+    sql_filters = {}
 vector_query = route.get("vector_query", query)
 
 st.info(f"AI decided search mode: **{mode.upper()}**")
 
 
 # ----------------------------------------------------
-# VECTOR SEARCH
+# VECTOR SEARCH (Hybrid = vector search prefiltered by sql_filters)
 # ----------------------------------------------------
 results = []
 
 if mode in ("vector", "hybrid"):
     with st.spinner("Generating embedding and searching vector DB..."):
 
-        # Generate embedding from user query
-        emb = get_embedding(vector_query)
+        # Generate embedding from user query. If the router returned
+        # paraphrase expansions, embed them all in one batched call and
+        # search with their centroid.
+        expansions = route.get("expansions") if isinstance(route.get("expansions"), list) else []
+        expansions = [e for e in expansions if isinstance(e, str) and e.strip()][:3]
+        if expansions:
+            embs = [e for e in cached_embeddings([vector_query] + expansions) if e]
+            emb = [sum(vals) / len(embs) for vals in zip(*embs)] if embs else None
+        else:
+            emb = cached_embedding(vector_query)
         pg_emb = embedding_to_pgvector(emb)
 
-        # Query Postgres vector index
-        rows = vector_search(pg_emb, limit=10)
+        # Query Postgres vector index (metadata filters applied in the same query)
+        filters = sql_filters if mode == "hybrid" else None
+        rows = vector_search(pg_emb, limit=10, filters=filters, ef_search=ef_search)
         results.extend(rows)
 
 
 # ----------------------------------------------------
-# SQL FILTER (Hybrid or SQL-only)
+# SQL FILTER (SQL-only)
 # ----------------------------------------------------
-if mode in ("sql", "hybrid"):
-    # Build SQL safely: check available columns and use parameterized filters
-    try:
-        cols_df = fetch_df("SELECT column_name FROM information_schema.columns WHERE table_name = 'alumni_internal';")
-        available_cols = set(cols_df['column_name'].tolist()) if not cols_df.empty else set()
-    except Exception:
-        available_cols = set()
+if mode == "sql":
+    # Build SQL safely: whitelist columns (cached lookup) and bind every value
+    available_cols = get_table_columns('alumni_internal')
 
     # Base select columns
     select_cols = [c for c in ['internal_id', 'student_name', 'batch'] if c in available_cols]
@@ -79,17 +98,22 @@ if mode in ("sql", "hybrid"):
     else:
         select_clause = ', '.join([f'ai.{c}' for c in select_cols])
 
-    sql = f"SELECT {select_clause} FROM alumni_internal ai WHERE 1=1"
-
+    where = []
     params = []
     for col, val in sql_filters.items():
-        if col not in available_cols:
+        if col not in available_cols or val is None:
             continue
-        sql += f" AND ai.{col} ILIKE %s"
+        where.append(f"ai.{col} ILIKE %s")
         params.append(f"%{val}%")
 
+    sql = f"SELECT {select_clause} FROM alumni_internal ai"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    # Only the first 10 results are shown
+    sql += " LIMIT 10"
+
     try:
-        sql_results = fetch_df(sql, params) if params else fetch_df(sql)
+        sql_results = fetch_df(sql, tuple(params)) if params else fetch_df(sql)
         results.extend(sql_results.to_dict(orient="records"))
     except Exception as e:
         st.error(f"SQL search failed: {e}")
@@ -104,7 +128,8 @@ if not results:
     st.warning("No matching alumni found.")
     st.stop()
 
-for r in results:
+def unpack_result(r):
+    """(internal_id, linkedin_id, combined_text, distance) from a vector or SQL row."""
     # Support both dict (from fetch_df) and tuple/list (from vector_search)
     if isinstance(r, (list, tuple)):
         internal_id = r[0] if len(r) > 0 else None
@@ -116,21 +141,128 @@ for r in results:
         linkedin_id = r.get("linkedin_id")
         combined_text = r.get("combined_text", "")
         distance = r.get("distance")
+    return internal_id, linkedin_id, combined_text, distance
 
-    # Fetch basic profile safely
-    profile = pd.DataFrame()
-    if linkedin_id:
-        try:
-            profile = fetch_df("SELECT * FROM alumni_external_linkedin WHERE linkedin_id = %s", (linkedin_id,))
-        except Exception:
-            profile = pd.DataFrame()
 
-    internal = pd.DataFrame()
-    if internal_id:
-        try:
-            internal = fetch_df("SELECT * FROM alumni_internal WHERE internal_id = %s", (internal_id,))
-        except Exception:
-            internal = pd.DataFrame()
+# ----------------------------------------------------
+# PREFETCH PROFILE DATA (one query per table, not per result)
+# ----------------------------------------------------
+def by_ids_query(table, col, ids):
+    """(sql, params) for SELECT * FROM table WHERE col IN ids, or None."""
+    if not ids or not col:
+        return None
+    return f"SELECT * FROM {table} WHERE {col} IN %s", (tuple(sorted(ids, key=str)),)
+
+
+def group_by_id(df, col):
+    """{id: DataFrame} split of df on col."""
+    if df.empty or col not in df.columns:
+        return {}
+    return {k: g for k, g in df.groupby(col)}
+
+
+def first_values_by_id(df, key, col, n):
+    """{id: "a, b, c"} — first n distinct non-null values of col per id."""
+    if df.empty or key not in df.columns or col not in df.columns:
+        return {}
+    vals = df[[key, col]].dropna().drop_duplicates()
+    vals = vals.groupby(key).head(n)
+    return vals[col].astype(str).groupby(vals[key]).agg(", ".join).to_dict()
+
+
+def child_fk(table):
+    """Pick the FK column a child table uses to point at alumni_internal."""
+    candidates = ['alumni_id', 'internal_id', 'alumni_internal_id']
+    cols = get_table_columns(table)
+    return next((c for c in candidates if c in cols), None)
+
+
+# One entry per alumnus (first = best-ranked occurrence wins), so no
+# profile is fetched, rendered or summarized twice
+unpacked = {}
+for r in results:
+    item = unpack_result(r)
+    unpacked.setdefault(item[0] or item[1] or id(r), item)
+unpacked = list(unpacked.values())[:10]
+internal_ids = {iid for iid, _, _, _ in unpacked if iid}
+linkedin_ids = {lid for _, lid, _, _ in unpacked if lid}
+skills_fk = child_fk('alumni_skills')
+exp_fk = child_fk('alumni_experiences')
+
+# The four lookups are independent, so they are issued concurrently
+prefetch = fetch_many({
+    name: q for name, q in {
+        "profiles": by_ids_query('alumni_external_linkedin', 'linkedin_id', linkedin_ids),
+        "internal": by_ids_query('alumni_internal', 'internal_id', internal_ids),
+        "skills": by_ids_query('alumni_skills', skills_fk, internal_ids),
+        "exp": by_ids_query('alumni_experiences', exp_fk, internal_ids),
+    }.items() if q
+})
+
+
+def prefetched(name):
+    """Prefetched frame by name (empty DataFrame if skipped or failed)."""
+    df = prefetch.get(name)
+    return df if isinstance(df, pd.DataFrame) else pd.DataFrame()
+
+
+profiles_all = prefetched("profiles")
+internal_all = prefetched("internal")
+skills_all = prefetched("skills")
+exp_all = prefetched("exp")
+
+profiles_by_id = group_by_id(profiles_all, 'linkedin_id')
+internal_by_id = group_by_id(internal_all, 'internal_id')
+skills_by_id = group_by_id(skills_all, skills_fk)
+exp_by_id = group_by_id(exp_all, exp_fk)
+
+# Per-id display strings, built column-wise over all results at once
+top_skills_by_id = first_values_by_id(skills_all, skills_fk, 'skill_name', 8)
+companies_by_id = first_values_by_id(exp_all, exp_fk, 'company_name', 3)
+profile_text_by_id = {}
+if not profiles_all.empty:
+    blank = pd.Series("", index=profiles_all.index)
+    profile_text = (
+        profiles_all.get('headline', blank).fillna("").astype(str)
+        + "\n"
+        + profiles_all.get('about', blank).fillna("").astype(str)
+    )
+    profile_text_by_id = dict(zip(profiles_all['linkedin_id'], profile_text))
+
+# AI summaries are generated on demand (per result, or all at once) and
+# kept in session_state keyed by the profile text. Only successes are kept;
+# a failure is shown for this run only, so the button can retry it.
+summary_texts = [
+    combined_text or profile_text_by_id.get(linkedin_id, "")
+    for _, linkedin_id, combined_text, _ in unpacked
+]
+
+
+def summary_key(text_blob):
+    return f"summary_{hash(text_blob)}"
+
+
+summary_errors = {}
+
+
+def store_summary(text_blob, summary):
+    if isinstance(summary, Exception):
+        summary_errors[summary_key(text_blob)] = summary
+    elif summary is not None:
+        st.session_state[summary_key(text_blob)] = summary
+
+
+pending = [t for t in summary_texts if t.strip() and summary_key(t) not in st.session_state]
+if pending and st.button("📘 Summarize all results"):
+    with st.spinner("Summarizing profiles..."):
+        for text_blob, summary in zip(pending, summarize_many(pending)):
+            store_summary(text_blob, summary)
+
+empty_df = pd.DataFrame()
+
+for i, ((internal_id, linkedin_id, combined_text, distance), text_blob) in enumerate(zip(unpacked, summary_texts)):
+    profile = profiles_by_id.get(linkedin_id, empty_df)
+    internal = internal_by_id.get(internal_id, empty_df)
 
     # Build manager-friendly summary
     name = None
@@ -144,56 +276,43 @@ for r in results:
     if not name and not internal.empty:
         name = internal.iloc[0].get('student_name')
 
-    # Get skills and recent companies (try common FK column names)
-    def safe_children(table, id_val):
-        if not id_val:
-            return pd.DataFrame()
-        candidates = ['alumni_id', 'internal_id', 'alumni_internal_id']
-        cols = get_table_columns(table)
-        fk = next((c for c in candidates if c in cols), None)
-        if not fk:
-            return pd.DataFrame()
-        try:
-            return fetch_df(f"SELECT * FROM {table} WHERE {fk} = %s", (id_val,))
-        except Exception:
-            return pd.DataFrame()
-
-    skills_df = safe_children('alumni_skills', internal_id)
-    exp_df = safe_children('alumni_experiences', internal_id)
+    skills_df = skills_by_id.get(internal_id, empty_df)
+    exp_df = exp_by_id.get(internal_id, empty_df)
 
-    top_skills = ", ".join(skills_df.get('skill_name', pd.Series(dtype=str)).dropna().unique()[:8]) if not skills_df.empty else "N/A"
-    recent_companies = ", ".join(exp_df.get('company_name', pd.Series(dtype=str)).dropna().unique()[:3]) if not exp_df.empty else "N/A"
+    top_skills = top_skills_by_id.get(internal_id) or "N/A"
+    recent_companies = companies_by_id.get(internal_id) or "N/A"
 
-    st.markdown("---")
-    st.markdown(f"### 👤 {name or 'Unknown'}")
+    # Static fields go out as one markdown element per result
+    lines = ["---", f"### 👤 {name or 'Unknown'}"]
     if headline:
-        st.write(f"**Headline:** {headline}")
+        lines.append(f"**Headline:** {headline}")
     if city:
-        st.write(f"**Location:** {city}")
-    st.write(f"**Internal ID:** {internal_id}")
-    st.write(f"**LinkedIn ID:** {linkedin_id}")
+        lines.append(f"**Location:** {city}")
+    lines.append(f"**Internal ID:** {internal_id}")
+    lines.append(f"**LinkedIn ID:** {linkedin_id}")
     if distance is not None:
         try:
-            st.write(f"**Similarity score:** {float(distance):.4f} (lower = more similar)")
+            lines.append(f"**Similarity score:** {float(distance):.4f} (lower = more similar)")
         except Exception:
-            st.write(f"**Similarity score:** {distance}")
+            lines.append(f"**Similarity score:** {distance}")
 
-    st.write(f"**Top skills:** {top_skills}")
-    st.write(f"**Recent companies:** {recent_companies}")
+    lines.append(f"**Top skills:** {top_skills}")
+    lines.append(f"**Recent companies:** {recent_companies}")
+    st.markdown("\n\n".join(lines))
 
     # Manager-friendly AI summary
     with st.expander("📘 AI Profile Summary (Manager)"):
-        try:
-            text_blob = combined_text or ""
-            if not text_blob and not profile.empty:
-                text_blob = '\n'.join([str(profile.iloc[0].get('headline','')), str(profile.iloc[0].get('about',''))])
-            if text_blob.strip():
-                summary = summarize_profile(text_blob)
-                st.write(summary)
-            else:
-                st.info("Not enough profile text available for AI summarization.")
-        except Exception as e:
-            st.error(f"AI summarization unavailable: {e}")
+        if not text_blob.strip():
+            st.info("Not enough profile text available for AI summarization.")
+        else:
+            key = summary_key(text_blob)
+            if key not in st.session_state and st.button("Generate summary", key=f"sum_{i}"):
+                with st.spinner("Summarizing profile..."):
+                    store_summary(text_blob, summary_or_error(text_blob))
+            if key in summary_errors:
+                st.error(f"AI summarization unavailable: {summary_errors[key]}")
+            elif key in st.session_state:
+                st.write(st.session_state[key])
 
     # Analyst details
     with st.expander("🔎 Analyst Details (Experience & Skills)"):
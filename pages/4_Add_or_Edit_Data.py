@@ -1,6 +1,7 @@
 import streamlit as st
 import pandas as pd
-from utils.db import fetch_df, run_sql
+from utils.db import fetch_df, run_sql, run_sql_many
+from utils.cache import cached_fetch, distinct
 from utils.helpers import sanitize, linkedin_slug
 
 st.set_page_config(layout="wide")
@@ -12,20 +13,9 @@ st.markdown(
 
 st.divider()
 
-# ----------------------------------------------------
-# LOAD INTERNAL ALUMNI LIST
-# ----------------------------------------------------
-df_internal = fetch_df("SELECT * FROM alumni_internal ORDER BY batch, student_name;")
-
-if df_internal.empty:
-    st.warning("No internal alumni records found in `alumni_internal`.")
-    st.stop()
-
-# For quick lookup
-df_internal["label"] = df_internal.apply(
-    lambda r: f"{r.get('student_name','')} ({r.get('batch','')}) - {r.get('roll_no','')}",
-    axis=1
-)
+# Alumni shown in the Edit tab picker (the list itself is searched
+# server-side, see the Edit tab)
+EDIT_SEARCH_LIMIT = 50
 
 # ----------------------------------------------------
 # TABS: ADD NEW / EDIT EXISTING
@@ -93,6 +83,8 @@ with tab_add:
                             sanitize(por),
                         ],
                     )
+                    cached_fetch.clear()
+                    distinct.clear()
                     st.success("✅ New alumni record added.")
                     st.info("Tip: Refresh other pages to see updated data.")
                 except Exception as e:
@@ -105,6 +97,35 @@ with tab_add:
 with tab_edit:
     st.subheader("✏️ Edit Existing Alumni")
 
+    # Typeahead: only the top matches are loaded (pg_trgm indexes, see migrations/)
+    search_term = st.text_input("Search alumni by name or roll number", "").strip()
+    pattern = f"%{search_term}%"
+    df_internal = fetch_df(
+        """
+        SELECT internal_id, student_name, batch, roll_no, gender,
+               whatsapp_no, mobile_no, college_email, personal_email, corporate_email,
+               linkedin_url, por
+        FROM alumni_internal
+        WHERE %s = '' OR student_name ILIKE %s OR roll_no ILIKE %s
+        ORDER BY batch, student_name
+        LIMIT %s;
+        """,
+        (search_term, pattern, pattern, EDIT_SEARCH_LIMIT)
+    )
+
+    if df_internal.empty:
+        st.warning("No matching alumni found in `alumni_internal`.")
+        st.stop()
+
+    if len(df_internal) == EDIT_SEARCH_LIMIT:
+        st.caption(f"Showing the first {EDIT_SEARCH_LIMIT} matches — refine the search to narrow the list.")
+
+    # For quick lookup
+    df_internal["label"] = df_internal.apply(
+        lambda r: f"{r.get('student_name','')} ({r.get('batch','')}) - {r.get('roll_no','')}",
+        axis=1
+    )
+
     # Select alumni to edit
     selected_label = st.selectbox(
         "Select an alumni to edit",
@@ -119,7 +140,7 @@ with tab_edit:
 
     # Load current mapping (if exists)
     df_map = fetch_df(
-        "SELECT * FROM alumni_identity_map WHERE internal_id = %s;",
+        "SELECT linkedin_id FROM alumni_identity_map WHERE internal_id = %s;",
         (internal_id,)
     )
 
@@ -182,7 +203,8 @@ with tab_edit:
 
             slug_e = linkedin_slug(linkedin_url_e) if linkedin_url_e else None
 
-            run_sql(
+            # Record update and mapping upsert are committed together
+            statements = [(
                 update_sql,
                 [
                     sanitize(student_name_e),
@@ -199,7 +221,7 @@ with tab_edit:
                     sanitize(por_e),
                     internal_id,
                 ],
-            )
+            )]
 
             # Update mapping if linkedin_id provided
             if new_linkedin_id.strip():
@@ -211,7 +233,10 @@ with tab_edit:
                     SET match_confidence = EXCLUDED.match_confidence,
                         match_method = EXCLUDED.match_method;
                 """
-                run_sql(map_sql, [internal_id, sanitize(new_linkedin_id.strip())])
+                statements.append((map_sql, [internal_id, sanitize(new_linkedin_id.strip())]))
 
+            run_sql_many(statements)
+            cached_fetch.clear()
+            distinct.clear()
             st.success("✅ Alumni record updated successfully.")
             st.info("Reload the page to see the latest data in other tabs.")
@@ -1,6 +1,9 @@
 import streamlit as st
 import pandas as pd
+import psycopg2.errors
 from utils.db import fetch_df, run_sql
+from utils.cache import fetch_many
+from utils.export import to_csv_bytes
 
 st.set_page_config(layout="wide")
 
@@ -10,18 +13,123 @@ st.divider()
 
 
 # ----------------------------------------------------
-# LOAD REQUIRED DATA (safe)
-# ----------------------------------------------------
-def safe_fetch(q):
-    try:
-        return fetch_df(q)
-    except Exception as e:
-        st.error(f"Data load failed: {e}")
+# LOAD REQUIRED DATA (safe) — cached briefly so widget reruns
+# (e.g. download clicks) don't re-query every check
+# ----------------------------------------------------
+@st.cache_data(ttl=60, max_entries=16, show_spinner=False)
+def admin_fetch(q):
+    return fetch_df(q)
+
+
+if st.button("🔄 Refresh now"):
+    if st.session_state.get("dq_views_available", True):
+        try:
+            run_sql("SELECT refresh_data_quality_views()")
+        except Exception as e:
+            st.error(f"Refreshing the data-quality views failed — showing the last refreshed data: {e}")
+    st.session_state.pop("dq_views_available", None)
+    admin_fetch.clear()
+
+
+# Precomputed checks (migrations/007), one trivial read per section
+VIEW_QUERIES = {
+    name: f"SELECT * FROM mv_{name}"
+    for name in (
+        "missing_fields", "stats", "unmapped_linkedin", "unmapped_internal",
+        "duplicate_linkedin", "duplicate_internal",
+    )
+}
+
+# Live fallback: every check's query, issued concurrently (independent reads)
+LIVE_QUERIES = {
+    # Only the fields the completeness check reads
+    "internal": """
+        SELECT internal_id, student_name, batch,
+               college_email, personal_email, mobile_no, whatsapp_no
+        FROM alumni_internal
+    """,
+    # Quick Stats totals, counted in Postgres (one row)
+    "stats": """
+        SELECT
+            (SELECT count(*) FROM alumni_internal) AS n_internal,
+            (SELECT count(*) FROM alumni_external_linkedin) AS n_external,
+            (SELECT count(*) FROM alumni_identity_map) AS n_map
+    """,
+    # Anti-joins run in Postgres (see migrations/003); only unmapped rows are sent
+    "unmapped_linkedin": """
+        SELECT e.* FROM alumni_external_linkedin e
+        WHERE NOT EXISTS (SELECT 1 FROM alumni_identity_map m WHERE m.linkedin_id = e.linkedin_id)
+    """,
+    "unmapped_internal": """
+        SELECT ai.* FROM alumni_internal ai
+        WHERE NOT EXISTS (SELECT 1 FROM alumni_identity_map m WHERE m.internal_id = ai.internal_id)
+    """,
+    # Grouped in Postgres: only the duplicated rows are sent
+    "duplicate_linkedin": """
+        SELECT * FROM alumni_external_linkedin
+        WHERE linkedin_id IN (
+            SELECT linkedin_id FROM alumni_external_linkedin
+            GROUP BY linkedin_id HAVING count(*) > 1
+        )
+    """,
+    # Window count instead of IN (...) so NULL batches group together,
+    # as duplicated() did
+    "duplicate_internal": """
+        SELECT * FROM (
+            SELECT ai.*, count(*) OVER (PARTITION BY student_name, batch) AS dup_count
+            FROM alumni_internal ai
+        ) t
+        WHERE dup_count > 1
+        ORDER BY student_name, batch
+    """,
+}
+
+# Whether the migrations/007 views exist, remembered per session so a
+# database without them doesn't re-issue the failing view reads on every
+# rerun ("Refresh now" probes again). Only a missing relation switches to
+# the live queries; other errors (timeouts, dropped connections) are
+# retried once here and otherwise shown per section, and the next rerun
+# reads the views again.
+use_views = st.session_state.get("dq_views_available", True)
+if use_views:
+    loaded = fetch_many(VIEW_QUERIES, fetch=admin_fetch)
+    failed = {name: VIEW_QUERIES[name] for name, df in loaded.items() if isinstance(df, Exception)}
+    if failed and not any(isinstance(loaded[name], psycopg2.errors.UndefinedTable) for name in failed):
+        loaded.update(fetch_many(failed, fetch=admin_fetch))
+    use_views = not any(isinstance(df, psycopg2.errors.UndefinedTable) for df in loaded.values())
+    st.session_state["dq_views_available"] = use_views
+if not use_views:
+    st.caption("Data-quality views not found — running checks live (apply migrations/007 to precompute them).")
+    loaded = fetch_many(LIVE_QUERIES, fetch=admin_fetch)
+
+
+def safe_fetch(name):
+    df = loaded[name]
+    if isinstance(df, Exception):
+        st.error(f"Data load failed: {df}")
         return pd.DataFrame()
+    return df
+
+
+df_internal = safe_fetch("internal") if "internal" in loaded else pd.DataFrame()
+df_stats = safe_fetch("stats")
+
 
-df_internal = safe_fetch("SELECT * FROM alumni_internal")
-df_external = safe_fetch("SELECT * FROM alumni_external_linkedin")
-df_map = safe_fetch("SELECT * FROM alumni_identity_map")
+def stat(key):
+    if df_stats.empty or key not in df_stats.columns:
+        return 0
+    return int(df_stats[key].iat[0] or 0)
+
+
+# The views are snapshots: writes (e.g. Add / Edit) show up after the next refresh
+if use_views and "refreshed_at" in df_stats.columns and not df_stats.empty:
+    refreshed_at = pd.Timestamp(df_stats["refreshed_at"].iat[0])
+    st.caption(
+        f"Checks as of {refreshed_at:%Y-%m-%d %H:%M %Z}. Recent edits appear after "
+        "the next refresh (hourly with pg_cron, or \"Refresh now\")."
+    )
+elif use_views:
+    st.caption("Checks are read from precomputed views; recent edits appear after \"Refresh now\".")
 
 
 # ----------------------------------------------------
@@ -29,16 +137,14 @@ df_map = safe_fetch("SELECT * FROM alumni_identity_map")
 # ----------------------------------------------------
 st.subheader("🔗 Unmapped LinkedIn Profiles")
 
-mapped_linkedin_ids = set(df_map.get("linkedin_id", pd.Series(dtype=str)).astype(str)) if not df_map.empty else set()
-df_unmapped_linkedin = df_external[~df_external.get("linkedin_id", pd.Series(dtype=str)).astype(str).isin(mapped_linkedin_ids)] if not df_external.empty else pd.DataFrame()
+df_unmapped_linkedin = safe_fetch("unmapped_linkedin")
 
 if df_unmapped_linkedin.empty:
     st.success("All LinkedIn profiles are mapped or no LinkedIn data available.")
 else:
     st.warning(f"{len(df_unmapped_linkedin)} LinkedIn profiles are not mapped to internal alumni.")
     st.dataframe(df_unmapped_linkedin, use_container_width=True)
-    csv = df_unmapped_linkedin.to_csv(index=False)
-    st.download_button("Export Unmapped LinkedIn", csv.encode('utf-8'), "unmapped_linkedin.csv")
+    st.download_button("Export Unmapped LinkedIn", to_csv_bytes(df_unmapped_linkedin), "unmapped_linkedin.csv")
 
 
 # ----------------------------------------------------
@@ -46,15 +152,14 @@ else:
 # ----------------------------------------------------
 st.subheader("👤 Internal Alumni Without LinkedIn Mapping")
 
-mapped_internal_ids = set(df_map.get("internal_id", pd.Series(dtype=str)).astype(str)) if not df_map.empty else set()
-df_unmapped_internal = df_internal[~df_internal.get("internal_id", pd.Series(dtype=str)).astype(str).isin(mapped_internal_ids)] if not df_internal.empty else pd.DataFrame()
+df_unmapped_internal = safe_fetch("unmapped_internal")
 
 if df_unmapped_internal.empty:
     st.success("All internal alumni have mapping or no internal data available.")
 else:
     st.warning(f"{len(df_unmapped_internal)} internal alumni are not mapped to LinkedIn.")
     st.dataframe(df_unmapped_internal, use_container_width=True)
-    st.download_button("Export Unmapped Internal", df_unmapped_internal.to_csv(index=False).encode('utf-8'), "unmapped_internal.csv")
+    st.download_button("Export Unmapped Internal", to_csv_bytes(df_unmapped_internal), "unmapped_internal.csv")
 
 
 # ----------------------------------------------------
@@ -62,34 +167,40 @@ else:
 # ----------------------------------------------------
 st.subheader("⚠️ Missing Fields (Data Completeness)")
 
-missing = []
-if not df_internal.empty:
-    for _, row in df_internal.iterrows():
-        issues = []
-        if not row.get("student_name"):
-            issues.append("Missing Name")
-        if not row.get("batch"):
-            issues.append("Missing Batch")
-        if not row.get("college_email") and not row.get("personal_email"):
-            issues.append("No Email")
-        if not row.get("mobile_no") and not row.get("whatsapp_no"):
-            issues.append("No Phone Number")
-        if issues:
-            missing.append({
-                "internal_id": row.get("internal_id"),
-                "name": row.get("student_name"),
-                "batch": row.get("batch"),
-                "issues": ", ".join(issues)
-            })
-
-df_missing = pd.DataFrame(missing)
+def blank(col):
+    """Boolean mask: df_internal[col] is null/empty (all True if the column is absent)."""
+    if col not in df_internal.columns:
+        return pd.Series(True, index=df_internal.index)
+    values = df_internal[col]
+    return values.isna() | values.astype(str).str.strip().eq("")
+
+
+df_missing = pd.DataFrame()
+if "missing_fields" in loaded:
+    df_missing = safe_fetch("missing_fields")
+elif not df_internal.empty:
+    issue_masks = pd.DataFrame({
+        "Missing Name": blank("student_name"),
+        "Missing Batch": blank("batch"),
+        "No Email": blank("college_email") & blank("personal_email"),
+        "No Phone Number": blank("mobile_no") & blank("whatsapp_no"),
+    })
+    has_issue = issue_masks.any(axis=1)
+    if has_issue.any():
+        flagged = issue_masks[has_issue]
+        df_missing = pd.DataFrame({
+            "internal_id": df_internal.loc[has_issue].get("internal_id"),
+            "name": df_internal.loc[has_issue].get("student_name"),
+            "batch": df_internal.loc[has_issue].get("batch"),
+            "issues": flagged.dot(flagged.columns + ", ").str.rstrip(", "),
+        })
 
 if df_missing.empty:
     st.success("No missing critical fields detected.")
 else:
     st.warning("Some alumni have missing important fields:")
     st.dataframe(df_missing, use_container_width=True)
-    st.download_button("Export Missing Fields", df_missing.to_csv(index=False).encode('utf-8'), "missing_fields.csv")
+    st.download_button("Export Missing Fields", to_csv_bytes(df_missing), "missing_fields.csv")
 
 
 # ----------------------------------------------------
@@ -97,14 +208,13 @@ else:
 # ----------------------------------------------------
 st.subheader("🔁 Duplicate LinkedIn IDs")
 
-if not df_external.empty:
-    dup = df_external[df_external.duplicated(subset="linkedin_id", keep=False)]
-    if dup.empty:
-        st.success("No duplicate LinkedIn IDs found.")
-    else:
-        st.error("Duplicate LinkedIn profiles detected (CRITICAL).")
-        st.dataframe(dup, use_container_width=True)
-        st.download_button("Export Duplicate LinkedIn", dup.to_csv(index=False).encode('utf-8'), "duplicate_linkedin.csv")
+dup = safe_fetch("duplicate_linkedin")
+if dup.empty:
+    st.success("No duplicate LinkedIn IDs found.")
+else:
+    st.error("Duplicate LinkedIn profiles detected (CRITICAL).")
+    st.dataframe(dup, use_container_width=True)
+    st.download_button("Export Duplicate LinkedIn", to_csv_bytes(dup), "duplicate_linkedin.csv")
 
 
 # ----------------------------------------------------
@@ -112,14 +222,13 @@ if not df_external.empty:
 # ----------------------------------------------------
 st.subheader("👥 Possible Duplicate Alumni Records")
 
-if not df_internal.empty and "student_name" in df_internal.columns:
-    dup_int = df_internal[df_internal.duplicated(subset=["student_name", "batch"], keep=False)]
-    if dup_int.empty:
-        st.success("No duplicates found in internal alumni.")
-    else:
-        st.error("Potential duplicates found:")
-        st.dataframe(dup_int, use_container_width=True)
-        st.download_button("Export Duplicate Internals", dup_int.to_csv(index=False).encode('utf-8'), "duplicate_internal.csv")
+dup_int = safe_fetch("duplicate_internal").drop(columns="dup_count", errors="ignore")
+if dup_int.empty:
+    st.success("No duplicates found in internal alumni.")
+else:
+    st.error("Potential duplicates found:")
+    st.dataframe(dup_int, use_container_width=True)
+    st.download_button("Export Duplicate Internals", to_csv_bytes(dup_int), "duplicate_internal.csv")
 
 
 # ----------------------------------------------------
@@ -127,9 +236,9 @@ if not df_internal.empty and "student_name" in df_internal.columns:
 # ----------------------------------------------------
 st.subheader("📊 Quick Stats Summary")
 
-st.metric("Total Internal Alumni", int(len(df_internal)))
-st.metric("Total LinkedIn Profiles Scraped", int(len(df_external)))
-st.metric("Mapped Profiles", int(len(df_map)))
+st.metric("Total Internal Alumni", stat("n_internal"))
+st.metric("Total LinkedIn Profiles Scraped", stat("n_external"))
+st.metric("Mapped Profiles", stat("n_map"))
 st.metric("Unmapped Internal", int(len(df_unmapped_internal)))
 st.metric("Unmapped LinkedIn", int(len(df_unmapped_linkedin)))
 
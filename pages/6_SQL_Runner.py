@@ -1,7 +1,20 @@
 import streamlit as st
-import pandas as pd
-import io
-from utils.db import fetch_df
+import re
+import functools
+from utils.db import fetch_df, stream_rows
+from utils.export import batches_to_csv_bytes, to_csv_bytes, to_excel_bytes
+
+# Optional sqlparse: classify the statement instead of scanning for keywords
+try:
+    import sqlparse
+    from sqlparse import tokens as sql_tokens
+    HAS_SQLPARSE = True
+except Exception:
+    HAS_SQLPARSE = False
+
+# Fallback check without sqlparse: one case-insensitive, word-bounded scan
+# (so e.g. "updated_at" is not mistaken for UPDATE)
+_UNSAFE = re.compile(r"\b(delete|update|insert|drop|alter|truncate|grant|revoke|copy)\b", re.IGNORECASE)
 
 st.set_page_config(layout="wide")
 
@@ -28,40 +41,144 @@ if mode == "Template (Manager)":
 else:
     query = st.text_area("Enter SQL SELECT query:", value="SELECT * FROM alumni_internal LIMIT 25;", height=200)
 
-# Safety checks
-lower_q = query.strip().lower()
-unsafe_keywords = ["delete", "update", "insert", "drop", "alter", "truncate"]
-if any(k in lower_q for k in unsafe_keywords):
-    st.error("Unsafe SQL detected. Only read-only SELECT queries are allowed.")
-    st.stop()
-if not lower_q.startswith("select"):
-    st.warning("Please enter a SELECT query.")
-    st.stop()
+# Safety checks (the query also runs in a READ ONLY transaction); only
+# evaluated when a button is clicked, so editing the query or switching
+# templates never halts the page
+def is_noise(tok):
+    """Whitespace or comment token (no effect on what the query does)."""
+    return tok.is_whitespace or tok.ttype in sql_tokens.Comment
+
+
+@functools.lru_cache(maxsize=256)
+def parse_single_select(sql):
+    """
+    The parsed statement if sql is exactly one SELECT with no other DML/DDL
+    keyword anywhere in it (e.g. a DELETE ... RETURNING inside a CTE),
+    else None. Comment-only statements are ignored. Works on tokens, so
+    string literals and names like updated_at are fine.
+    """
+    statements = [
+        s for s in sqlparse.parse(sql)
+        if not all(is_noise(tok) for tok in s.flatten())
+    ]
+    if len(statements) != 1 or statements[0].get_type() != "SELECT":
+        return None
+    if any(
+        tok.ttype in (sql_tokens.Keyword.DML, sql_tokens.Keyword.DDL) and tok.normalized != "SELECT"
+        for tok in statements[0].flatten()
+    ):
+        return None
+    return statements[0]
+
+
+def validation_error(sql):
+    """Message explaining why sql may not run, or None if it is allowed."""
+    if HAS_SQLPARSE:
+        if parse_single_select(sql) is None:
+            return "Only a single read-only SELECT query is allowed."
+        # The query runs wrapped in a preview subquery; it must still be one SELECT
+        if parse_single_select(with_preview_limit(sql, 1)) is None:
+            return "This query cannot be wrapped for preview. Remove trailing text after the SELECT."
+        return None
+    if _UNSAFE.search(sql):
+        return "Unsafe SQL detected. Only read-only SELECT queries are allowed."
+    if not sql.lstrip().lower().startswith("select"):
+        return "Please enter a SELECT query."
+    return None
+
+
+# Preview is capped server-side by wrapping the query, so the cap holds
+# whatever the query itself contains (inner LIMITs, trailing comments);
+# the full result is only read by the streamed CSV export
+max_rows = st.slider("Max preview rows", min_value=100, max_value=10_000, value=1000, step=100)
+
+
+def statement_body(sql):
+    """
+    sql without its terminal ';' and any trailing comments, so it can be
+    embedded in another statement. Uses the statement parsed for
+    validation; without sqlparse only a trailing ';' is removed.
+    """
+    statement = parse_single_select(sql) if HAS_SQLPARSE else None
+    if statement is None:
+        return sql.strip().rstrip(';')
+    tokens = list(statement.flatten())
+    while tokens and (is_noise(tokens[-1]) or tokens[-1].match(sql_tokens.Punctuation, ";")):
+        tokens.pop()
+    return "".join(str(tok) for tok in tokens)
+
+
+def with_preview_limit(sql, limit):
+    return f"SELECT * FROM (\n{statement_body(sql)}\n) AS _q LIMIT {int(limit)}"
+
+
+# Manager templates are fixed SQL, so their results are cached briefly;
+# custom analyst queries always run live
+@st.cache_data(ttl=300, max_entries=64, show_spinner=False)
+def cached_template_fetch(sql):
+    return fetch_df(sql, read_only=True)
 
-run = st.button("▶️ Run Query")
+
+col_run, col_full, col_clear = st.columns(3)
+run = col_run.button("▶️ Run Query (preview)")
+export_full = col_full.button("⬇️ Export full result (CSV)")
+if col_clear.button("🧹 Clear template cache"):
+    cached_template_fetch.clear()
+
+error = validation_error(query) if run or export_full else None
+if error:
+    st.error(error)
+    run = export_full = False
+
+if export_full:
+    try:
+        with st.spinner("Streaming full result..."):
+            data = batches_to_csv_bytes(stream_rows(statement_body(query), read_only=True))
+        st.download_button("Download full CSV", data, "query_results_full.csv", mime="text/csv")
+    except Exception as e:
+        st.error(f"SQL Error: {e}")
+
+# The last result is kept in session_state so paging through it (a rerun)
+# doesn't re-run the query; only PAGE_ROWS rows are sent to the browser
+PAGE_ROWS = 250
 
 if run:
     try:
         with st.spinner("Running query..."):
-            df = fetch_df(query)
-
-        st.success(f"Query executed successfully. Returned {len(df)} rows.")
-        st.dataframe(df)
-
-        st.subheader("Export")
-        col1, col2 = st.columns(2)
-        col1.download_button("Download CSV", df.to_csv(index=False).encode('utf-8'), "query_results.csv")
-        try:
-            import io
-            buf = io.BytesIO()
-            with pd.ExcelWriter(buf, engine=(EXCEL_ENGINE or 'openpyxl')) as writer:
-                df.to_excel(writer, index=False, sheet_name='Results')
-            col2.download_button("Download Excel", buf.getvalue(), "query_results.xlsx")
-        except Exception:
-            col2.info("Excel export not available. Install XlsxWriter or openpyxl.")
-
+            preview_sql = with_preview_limit(query, max_rows)
+            if mode == "Template (Manager)":
+                df = cached_template_fetch(preview_sql)
+            else:
+                df = fetch_df(preview_sql, read_only=True)
+        st.session_state["sql_result"] = {"query": query, "max_rows": max_rows, "df": df}
     except Exception as e:
+        st.session_state.pop("sql_result", None)
         st.error(f"SQL Error: {e}")
 
+result = st.session_state.get("sql_result")
+if result and result["query"] == query and result["max_rows"] == max_rows:
+    df = result["df"]
+
+    st.success(f"Query executed successfully. Returned {len(df)} rows.")
+    if len(df) == max_rows:
+        st.caption(f"Preview limited to {max_rows} rows — use 'Export full result' for everything.")
+
+    page_count = max(1, -(-len(df) // PAGE_ROWS))
+    page = 1
+    if page_count > 1:
+        page = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1)
+    start = (int(page) - 1) * PAGE_ROWS
+    if page_count > 1:
+        st.caption(f"Rows {start + 1}–{min(start + PAGE_ROWS, len(df))} of {len(df)}")
+    st.dataframe(df.iloc[start:start + PAGE_ROWS])
+
+    st.subheader("Export")
+    col1, col2 = st.columns(2)
+    col1.download_button("Download CSV", to_csv_bytes(df), "query_results.csv")
+    try:
+        col2.download_button("Download Excel", to_excel_bytes(df, sheet_name='Results'), "query_results.xlsx")
+    except Exception:
+        col2.info("Excel export not available. Install XlsxWriter or openpyxl.")
+
 st.markdown("---")
 st.caption("Use templates for common manager queries. Analysts can use custom SELECTs but destructive queries are blocked.")
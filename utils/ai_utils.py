@@ -1,6 +1,7 @@
 import os
-from dotenv import load_dotenv
-from .helpers import sanitize, safe_join
+import json
+import threading
+from .helpers import load_env, sanitize, safe_join
 
 # Try importing OpenAI SDK; if unavailable, set a flag and defer errors to runtime
 try:
@@ -9,15 +10,35 @@ try:
 except Exception:
     HAS_OPENAI = False
 
-load_dotenv()
+# Optional faster JSON decoder for model replies; stdlib json otherwise
+try:
+    import orjson
+    json_loads = orjson.loads
+except Exception:
+    json_loads = json.loads
+
+load_env("OPENAI_API_KEY")
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-# Initialize client only if OpenAI package is present and key provided
-if HAS_OPENAI and OPENAI_API_KEY:
-    client = OpenAI(api_key=OPENAI_API_KEY)
-else:
-    client = None
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Process-wide OpenAI client, created on first use (so importing this
+    module stays cheap for pages that never call the API). Raises if the
+    package is missing or OPENAI_API_KEY is not set.
+    """
+    global _client
+    if _client is None:
+        if not HAS_OPENAI or not OPENAI_API_KEY:
+            raise RuntimeError("OpenAI client not available. Install the 'openai' package and set OPENAI_API_KEY in your environment.")
+        with _client_lock:
+            if _client is None:
+                _client = OpenAI(api_key=OPENAI_API_KEY)
+    return _client
 
 
 # -------------------------------------------------------------
@@ -27,9 +48,15 @@ def get_embedding(text, model="text-embedding-3-small"):
     """
     Convert text to embedding using OpenAI.
     Returns: python list of floats
+
+    text may also be a list of strings: all of them are embedded in a
+    single API request and a list of embeddings is returned in the same
+    order (None for blank entries).
     """
-    if not HAS_OPENAI or client is None:
-        raise RuntimeError("OpenAI client not available. Install the 'openai' package and set OPENAI_API_KEY in your environment.")
+    client = get_client()
+
+    if isinstance(text, (list, tuple)):
+        return _get_embeddings(text, model)
 
     text = sanitize(text)
 
@@ -44,12 +71,34 @@ def get_embedding(text, model="text-embedding-3-small"):
     return emb
 
 
+def _get_embeddings(texts, model):
+    cleaned = [sanitize(t) if isinstance(t, str) else None for t in texts]
+    # Only non-blank inputs are sent, shortest first
+    order = sorted(
+        (i for i, t in enumerate(cleaned) if t),
+        key=lambda i: len(cleaned[i])
+    )
+    embeddings = [None] * len(cleaned)
+    if not order:
+        return embeddings
+
+    data = get_client().embeddings.create(
+        model=model,
+        input=[cleaned[i] for i in order],
+    ).data
+
+    for item in data:
+        embeddings[order[item.index]] = item.embedding
+    return embeddings
+
+
 # -------------------------------------------------------------
 # FORMAT EMBEDDING LIST INTO PGVECTOR TEXT
 # -------------------------------------------------------------
 def embedding_to_pgvector(emb):
     """
     Convert python list to pgvector string: "[1.23, -0.44, ...]"
+    (the same literal is accepted for vector and halfvec columns)
     """
     if not emb:
         return None
@@ -123,8 +172,7 @@ def summarize_profile(profile_text):
     - Education
     """
 
-    if not HAS_OPENAI or client is None:
-        raise RuntimeError("OpenAI client not available. Install the 'openai' package and set OPENAI_API_KEY in your environment.")
+    client = get_client()
 
     response = client.chat.completions.create(
         model="gpt-4o-mini",
@@ -160,23 +208,29 @@ def interpret_query(user_query):
     {
         "mode": "vector" | "sql" | "hybrid",
         "sql_filters": { ... },
-        "vector_query": "..."
+        "vector_query": "...",
+        "expansions": ["...", "..."]
     }
+
+    "expansions" holds up to 3 short paraphrases of vector_query (other
+    wordings, synonyms, related roles) for vector / hybrid mode; use []
+    for sql mode.
     """
 
-    if not HAS_OPENAI or client is None:
-        raise RuntimeError("OpenAI client not available. Install the 'openai' package and set OPENAI_API_KEY in your environment.")
+    client = get_client()
 
+    # JSON mode: the reply is always a single valid JSON object, so it can
+    # be parsed directly (no fenced or prose-wrapped replies)
     resp = client.chat.completions.create(
         model="gpt-4o-mini",
         messages=[
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_query}
-        ]
+        ],
+        response_format={"type": "json_object"},
     )
 
-    import json
     content = getattr(resp.choices[0].message, "content", None)
     if content is None:
         raise RuntimeError("No content returned from OpenAI chat completion.")
-    return json.loads(content)
+    return json_loads(content)
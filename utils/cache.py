@@ -0,0 +1,172 @@
+import streamlit as st
+import pandas as pd
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .db import fetch_df
+from .ai_utils import get_embedding, interpret_query, summarize_profile
+
+# -------------------------------------------------------------
+# CACHED SELECT (shared across reruns & sessions)
+# -------------------------------------------------------------
+@st.cache_data(ttl=600, show_spinner=False)
+def cached_fetch(sql: str, params=None) -> pd.DataFrame:
+    """
+    Same as fetch_df, but memoized on the exact SQL string (+ params)
+    for 10 minutes. params must be hashable (use a tuple, not a list).
+    """
+    return fetch_df(sql, params)
+
+
+# -------------------------------------------------------------
+# TOP-N VALUE COUNTS (grouped in Postgres, not pandas)
+# -------------------------------------------------------------
+def top_n_sql(table, col, n):
+    """
+    SQL for the n most frequent non-null values of table.col -> [col, cnt].
+    table / col are interpolated, so only pass trusted identifiers.
+    """
+    return (
+        f"SELECT {col}, count(*) AS cnt FROM {table} "
+        f"WHERE {col} IS NOT NULL GROUP BY {col} ORDER BY cnt DESC LIMIT {int(n)}"
+    )
+
+
+# -------------------------------------------------------------
+# SEVERAL CACHED SELECTS AT ONCE (issued concurrently)
+# -------------------------------------------------------------
+def _fetch_or_error(fetch, query):
+    sql, params = query if isinstance(query, tuple) else (query, None)
+    try:
+        return fetch(sql, params) if params is not None else fetch(sql)
+    except Exception as e:
+        return e
+
+
+def fetch_many(queries, max_workers=5, fetch=None):
+    """
+    Run {name: sql} (or {name: (sql, params)}) through cached_fetch (or
+    another fetch(sql[, params]) function) in a thread pool and return
+    {name: DataFrame}. On a cold cache the wall time is roughly the
+    slowest query instead of the sum; a failed query maps to its
+    exception so callers can handle it per name.
+    """
+    if not queries:
+        return {}
+    fetch = fetch or cached_fetch
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(queries))) as ex:
+        results = ex.map(lambda q: _fetch_or_error(fetch, q), queries.values())
+        return dict(zip(queries, results))
+
+
+# -------------------------------------------------------------
+# DISTINCT VALUES (for filter dropdowns)
+# -------------------------------------------------------------
+@st.cache_data(ttl=3600, show_spinner=False)
+def distinct(table, col):
+    """
+    Sorted distinct non-empty values of table.col as a list of str.
+    table / col are interpolated, so only pass trusted identifiers.
+    """
+    df = fetch_df(
+        f"SELECT DISTINCT {col}::text AS value FROM {table} "
+        f"WHERE {col} IS NOT NULL AND btrim({col}::text) <> '' ORDER BY 1"
+    )
+    return df["value"].tolist() if not df.empty else []
+
+
+# -------------------------------------------------------------
+# AI QUERY ROUTING + EMBEDDINGS (one OpenAI call per unique query)
+# -------------------------------------------------------------
+# Set by the cached bodies below, which only run on a cache miss.
+# Thread-local, so concurrent sessions don't see each other's misses.
+_ai_call = threading.local()
+
+
+def _query_key(text):
+    """
+    Cache key for a user query: case- and whitespace-insensitive. Only the
+    key is normalized; the model always gets the text as typed (the cached
+    bodies take it as an _-prefixed argument, which st.cache_data does not
+    hash).
+    """
+    return " ".join((text or "").split()).lower()
+
+
+def _count_cache_hit(kind):
+    """Record a hit/miss for `kind` in st.session_state["cache_stats"]."""
+    stats = st.session_state.setdefault("cache_stats", {})
+    counts = stats.setdefault(kind, {"hits": 0, "misses": 0})
+    counts["misses" if getattr(_ai_call, "missed", False) else "hits"] += 1
+
+
+@st.cache_data(ttl=3600, max_entries=1000, show_spinner=False)
+def _interpret_query_cached(key, _user_query):
+    _ai_call.missed = True
+    return interpret_query(_user_query)
+
+
+@st.cache_data(ttl=3600, max_entries=1000, show_spinner=False)
+def _embedding_cached(key, _text):
+    _ai_call.missed = True
+    return get_embedding(_text)
+
+
+@st.cache_data(ttl=3600, max_entries=1000, show_spinner=False)
+def _embeddings_cached(keys, _texts):
+    _ai_call.missed = True
+    return get_embedding(list(_texts))
+
+
+def cached_interpret_query(user_query):
+    _ai_call.missed = False
+    route = _interpret_query_cached(_query_key(user_query), user_query)
+    _count_cache_hit("interpret_query")
+    return route
+
+
+def cached_embedding(text):
+    _ai_call.missed = False
+    emb = _embedding_cached(_query_key(text), text)
+    _count_cache_hit("embedding")
+    return emb
+
+
+def cached_embeddings(texts):
+    """Embeddings for several texts, fetched in one batched API call."""
+    _ai_call.missed = False
+    texts = list(texts)
+    embs = _embeddings_cached(tuple(_query_key(t) for t in texts), texts)
+    _count_cache_hit("embedding")
+    return embs
+
+
+# -------------------------------------------------------------
+# AI PROFILE SUMMARIES (cached per text, fetched concurrently)
+# -------------------------------------------------------------
+@st.cache_data(ttl=86400, show_spinner=False)
+def cached_summary(profile_text):
+    return summarize_profile(profile_text)
+
+
+def summary_or_error(profile_text):
+    """Cached summary of profile_text; None if blank, the exception if the call failed."""
+    if not profile_text or not profile_text.strip():
+        return None
+    try:
+        return cached_summary(profile_text)
+    except Exception as e:
+        return e
+
+
+def summarize_many(texts, max_workers=8):
+    """
+    Summaries for a list of profile texts, in the same order.
+    LLM calls run in a thread pool, so total latency is roughly the
+    slowest call rather than the sum. Blank texts map to None; a failed
+    call maps to its exception so callers can report it per item.
+    """
+    texts = list(texts)
+    if not texts:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(texts))) as ex:
+        return list(ex.map(summary_or_error, texts))
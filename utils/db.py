@@ -1,53 +1,211 @@
 import os
 import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
 import pandas as pd
 from psycopg2.extras import RealDictCursor
-from dotenv import load_dotenv
+from .helpers import load_env
+import contextlib
 import functools
+import threading
 
-load_dotenv()
+load_env("DATABASE_URL")
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# TCP keepalives keep idle pooled connections from being silently dropped
+# by NATs / the Supabase pooler, and surface dead peers within ~1 minute
+CONNECT_KWARGS = dict(
+    cursor_factory=RealDictCursor,
+    keepalives=1,
+    keepalives_idle=30,
+    keepalives_interval=10,
+    keepalives_count=3,
+)
+
 # -----------------------------------------------------------------------
 # CONNECT TO SUPABASE POSTGRES
 # -----------------------------------------------------------------------
 
 def get_conn():
-    return psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
+    return psycopg2.connect(DATABASE_URL, **CONNECT_KWARGS)
 
 
-@functools.lru_cache(maxsize=32)
-def get_table_columns(table_name: str):
-    """Return a set of column names for the given table (cached)."""
+# -----------------------------------------------------------------------
+# CONNECTION POOL (shared by every page in this process)
+# -----------------------------------------------------------------------
+
+POOL_MIN_CONN = 1
+POOL_MAX_CONN = 10
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Process-wide ThreadedConnectionPool, created on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = psycopg2.pool.ThreadedConnectionPool(
+                    POOL_MIN_CONN, POOL_MAX_CONN, DATABASE_URL, **CONNECT_KWARGS,
+                )
+    return _pool
+
+
+def is_alive(conn):
+    """
+    Pre-ping: one SELECT 1 round trip, run in autocommit so no transaction
+    is left open (fetch_df's SET TRANSACTION READ ONLY must come first).
+    False if the server or pooler has dropped the connection.
+    """
+    if conn.closed:
+        return False
+    try:
+        conn.autocommit = True
+        conn.cursor().execute("SELECT 1")
+        conn.autocommit = False
+        return True
+    except psycopg2.Error:
+        return False
+
+
+@contextlib.contextmanager
+def connection():
+    """
+    Borrow a pooled connection; any open transaction is rolled back before
+    it is returned (callers that write must commit). Each checkout is
+    pre-pinged (is_alive), and dead or broken connections are discarded
+    from the pool instead of being handed out. If the pool is exhausted,
+    falls back to a one-off connection instead of failing.
+    """
+    pool = get_pool()
     try:
+        conn = pool.getconn()
+        # Every idle connection may have been dropped at once (e.g. by the
+        # pooler's idle timeout); once they are discarded the pool opens new ones
+        for _ in range(POOL_MAX_CONN):
+            if is_alive(conn):
+                break
+            pool.putconn(conn, close=True)
+            conn = pool.getconn()
+    except psycopg2.pool.PoolError:
+        conn = None
+    if conn is None:
         conn = get_conn()
+        try:
+            yield conn
+        finally:
+            conn.close()
+        return
+    try:
+        yield conn
+    finally:
+        broken = bool(conn.closed)
+        if not broken:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                broken = True
+        pool.putconn(conn, close=broken)
+
+
+@functools.lru_cache(maxsize=32)
+def _table_columns(table_name: str):
+    with connection() as conn:
         cur = conn.cursor()
         cur.execute(
             "SELECT column_name FROM information_schema.columns WHERE table_name = %s;",
             (table_name,)
         )
         rows = cur.fetchall()
-        conn.close()
-        return set(r['column_name'] for r in rows)
+    if not rows:
+        raise LookupError(f"No columns found for table {table_name!r}")
+    return frozenset(r['column_name'] for r in rows)
+
+
+def get_table_columns(table_name: str):
+    """
+    Return the set of column names for the given table (cached). A failed
+    or empty lookup returns an empty set and is not cached, so it is
+    retried on the next call.
+    """
+    try:
+        return _table_columns(table_name)
     except Exception:
-        return set()
+        return frozenset()
+
+
+@functools.lru_cache(maxsize=32)
+def get_column_type(table_name: str, column_name: str):
+    """
+    Return the SQL type of table.column, e.g. 'halfvec(1536)' (cached);
+    None if there is no such column. Errors propagate, so a failed lookup
+    is not cached.
+    """
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT format_type(atttypid, atttypmod) AS type FROM pg_attribute
+            WHERE attrelid = %s::regclass AND attname = %s AND NOT attisdropped;
+            """,
+            (table_name, column_name)
+        )
+        row = cur.fetchone()
+    return row['type'] if row else None
 
 
 # -----------------------------------------------------------------------
 # RUN A SELECT QUERY AND RETURN A PANDAS DATAFRAME
 # -----------------------------------------------------------------------
 
-def fetch_df(query, params=None):
-    conn = get_conn()
-    cur = conn.cursor()
-    if params is None:
-        cur.execute(query)
-    else:
-        cur.execute(query, params)
-    rows = cur.fetchall()
-    conn.close()
-    return pd.DataFrame(rows)
+def fetch_df(query, params=None, read_only=False):
+    """
+    read_only=True runs the query in a READ ONLY transaction, so Postgres
+    itself rejects any write (used for user-supplied SQL).
+    """
+    with connection() as conn:
+        # Plain tuple cursor: rows go straight into DataFrame.from_records
+        # without building a dict per row (RealDictCursor) first
+        cur = conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+        if read_only:
+            cur.execute("SET TRANSACTION READ ONLY")
+        if params is None:
+            cur.execute(query)
+        else:
+            cur.execute(query, params)
+        rows = cur.fetchall()
+        columns = [d[0] for d in cur.description]
+    return pd.DataFrame.from_records(rows, columns=columns)
+
+
+# -----------------------------------------------------------------------
+# STREAM A SELECT IN BATCHES (SERVER-SIDE CURSOR)
+# -----------------------------------------------------------------------
+
+def stream_rows(query, params=None, batch_size=10000, read_only=False):
+    """
+    Yield (columns, rows) batches of at most batch_size tuples, read through
+    a named (server-side) cursor so the full result is never buffered by
+    the client at once.
+    """
+    with connection() as conn:
+        if read_only:
+            conn.cursor().execute("SET TRANSACTION READ ONLY")
+        cur = conn.cursor(name="stream_rows", cursor_factory=psycopg2.extensions.cursor)
+        cur.itersize = batch_size
+        if params is None:
+            cur.execute(query)
+        else:
+            cur.execute(query, params)
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield [d[0] for d in cur.description], rows
+        cur.close()
 
 
 # -----------------------------------------------------------------------
@@ -55,14 +213,28 @@ def fetch_df(query, params=None):
 # -----------------------------------------------------------------------
 
 def run_sql(query, params=None):
-    conn = get_conn()
-    cur = conn.cursor()
-    if params is None:
-        cur.execute(query)
-    else:
-        cur.execute(query, params)
-    conn.commit()
-    conn.close()
+    with connection() as conn:
+        cur = conn.cursor()
+        if params is None:
+            cur.execute(query)
+        else:
+            cur.execute(query, params)
+        conn.commit()
+
+
+def run_sql_many(statements):
+    """
+    Run [(query, params), ...] in one transaction with a single commit,
+    so related writes cost one commit and either all apply or none do.
+    """
+    with connection() as conn:
+        cur = conn.cursor()
+        for query, params in statements:
+            if params is None:
+                cur.execute(query)
+            else:
+                cur.execute(query, params)
+        conn.commit()
 
 
 # -----------------------------------------------------------------------
@@ -70,26 +242,24 @@ def run_sql(query, params=None):
 # -----------------------------------------------------------------------
 
 def fetch_all(query, params=None):
-    conn = get_conn()
-    cur = conn.cursor()
-    if params is None:
-        cur.execute(query)
-    else:
-        cur.execute(query, params)
-    rows = cur.fetchall()
-    conn.close()
+    with connection() as conn:
+        cur = conn.cursor()
+        if params is None:
+            cur.execute(query)
+        else:
+            cur.execute(query, params)
+        rows = cur.fetchall()
     return rows
 
 
 def fetch_one(query, params=None):
-    conn = get_conn()
-    cur = conn.cursor()
-    if params is None:
-        cur.execute(query)
-    else:
-        cur.execute(query, params)
-    row = cur.fetchone()
-    conn.close()
+    with connection() as conn:
+        cur = conn.cursor()
+        if params is None:
+            cur.execute(query)
+        else:
+            cur.execute(query, params)
+        row = cur.fetchone()
     return row
 
 
@@ -97,24 +267,60 @@ def fetch_one(query, params=None):
 # VECTOR SEARCH (USED BY AI SEARCH LATER)
 # -----------------------------------------------------------------------
 
-def vector_search(query_vec, limit=10):
+def vector_search(query_vec, limit=10, filters=None, ef_search=None):
     """
-    query_vec must be "[0.123, -0.443, ...]" format
+    query_vec must be "[0.123, -0.443, ...]" format (cast to the column's
+    type: halfvec since migrations/002, vector on databases without it)
+
+    filters: optional {alumni_internal column: value} metadata prefilter,
+    applied as ILIKE '%value%' in the same query as the ANN search.
+    Unknown columns and None values are ignored. distance is cosine
+    distance (lower = more similar), served by the HNSW index.
+
+    ef_search: HNSW candidate list size for this query (recall vs latency).
+    Defaults to max(100, 2 * limit), matched to the m=24 index (migrations/002).
     """
-    sql = """
+    if ef_search is None:
+        ef_search = max(100, 2 * int(limit))
+
+    try:
+        column_type = get_column_type('alumni_embeddings', 'embedding') or 'halfvec'
+    except Exception:
+        column_type = 'halfvec'  # this search only; the lookup is retried next time
+    vec_type = 'vector' if column_type.startswith('vector') else 'halfvec'
+
+    where = []
+    params = [query_vec]
+    join = ""
+    if filters:
+        available_cols = get_table_columns('alumni_internal')
+        for col, val in filters.items():
+            if col not in available_cols or val is None:
+                continue
+            where.append(f"ai.{col} ILIKE %s")
+            params.append(f"%{val}%")
+        if where:
+            join = "JOIN alumni_internal ai ON ai.internal_id = e.alumni_internal_id"
+
+    sql = f"""
         SELECT
-            alumni_internal_id,
-            linkedin_id,
-            combined_text,
-            embedding <-> %s::vector AS distance
-        FROM alumni_embeddings
-        ORDER BY embedding <-> %s::vector
+            e.alumni_internal_id,
+            e.linkedin_id,
+            e.combined_text,
+            e.embedding <=> %s::{vec_type} AS distance
+        FROM alumni_embeddings e
+        {join}
+        {"WHERE " + " AND ".join(where) if where else ""}
+        ORDER BY distance
         LIMIT %s;
     """
+    params.append(limit)
 
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(sql, (query_vec, query_vec, limit))
-    rows = cur.fetchall()
-    conn.close()
+    with connection() as conn:
+        cur = conn.cursor()
+        # Transaction-local: a wider HNSW candidate list keeps the index
+        # competitive with an exact scan when filters drop candidates
+        cur.execute("SELECT set_config('hnsw.ef_search', %s, true)", (str(int(ef_search)),))
+        cur.execute(sql, tuple(params))
+        rows = cur.fetchall()
     return rows
@@ -0,0 +1,121 @@
+import io
+import csv
+import datetime
+import decimal
+import numpy as np
+import pandas as pd
+
+# Excel writer engine detection (xlsxwriter can stream rows in constant memory)
+try:
+    import xlsxwriter  # type: ignore
+    HAS_XLSXWRITER = True
+except Exception:
+    HAS_XLSXWRITER = False
+
+try:
+    import openpyxl  # type: ignore
+    HAS_OPENPYXL = True
+except Exception:
+    HAS_OPENPYXL = False
+
+# Cell types xlsxwriter writes natively; anything else is written as text
+_EXCEL_NATIVE = (
+    str, int, float, bool, decimal.Decimal,
+    datetime.date, datetime.time, datetime.timedelta, np.generic,
+)
+
+
+# -------------------------------------------------------------
+# DATAFRAME -> CSV BYTES
+# -------------------------------------------------------------
+CSV_CHUNK_ROWS = 50_000
+
+
+def to_csv_bytes(df):
+    """
+    Serialize df as UTF-8 CSV bytes, writing straight into a binary
+    buffer (no intermediate Python str + .encode() copy), CSV_CHUNK_ROWS
+    rows at a time so the formatting buffer stays bounded.
+    """
+    buf = io.BytesIO()
+    df.to_csv(buf, index=False, encoding="utf-8", chunksize=CSV_CHUNK_ROWS)
+    return buf.getvalue()
+
+
+# -------------------------------------------------------------
+# ROW BATCHES -> CSV BYTES (no DataFrame)
+# -------------------------------------------------------------
+def batches_to_csv_bytes(batches):
+    """
+    Serialize an iterable of (columns, rows) batches (see db.stream_rows)
+    as UTF-8 CSV bytes. The header is taken from the first batch; an empty
+    iterable gives empty bytes.
+    """
+    buf = io.BytesIO()
+    text = io.TextIOWrapper(buf, encoding="utf-8", newline="")
+    writer = csv.writer(text, lineterminator="\n")
+    header_written = False
+    for columns, rows in batches:
+        if not header_written:
+            writer.writerow(columns)
+            header_written = True
+        writer.writerows(rows)
+    text.flush()
+    data = buf.getvalue()
+    text.detach()
+    return data
+
+
+# -------------------------------------------------------------
+# DATAFRAME -> XLSX BYTES
+# -------------------------------------------------------------
+def _excel_cell(value):
+    if value is None:
+        return None
+    if isinstance(value, _EXCEL_NATIVE):
+        return None if pd.isna(value) else value
+    return str(value)
+
+
+def _openpyxl_cell(value):
+    value = _excel_cell(value)
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, datetime.datetime) and value.tzinfo is not None:
+        value = value.replace(tzinfo=None)
+    return value
+
+
+def to_excel_bytes(df, sheet_name="Sheet1"):
+    """
+    Serialize df as .xlsx bytes.
+
+    With xlsxwriter, rows are written one by one in constant_memory mode,
+    so each row is flushed as soon as it is written and peak memory does
+    not grow with the row count. (pandas' to_excel writes column by column,
+    which constant_memory mode cannot handle.) Without xlsxwriter, falls
+    back to an openpyxl write_only workbook, which also appends row by row;
+    raises if neither is installed.
+    """
+    buf = io.BytesIO()
+    if HAS_XLSXWRITER:
+        wb = xlsxwriter.Workbook(buf, {
+            "constant_memory": True,
+            "remove_timezone": True,
+            "default_date_format": "yyyy-mm-dd hh:mm:ss",
+        })
+        ws = wb.add_worksheet(sheet_name)
+        ws.write_row(0, 0, [str(c) for c in df.columns])
+        for i, row in enumerate(df.itertuples(index=False, name=None), start=1):
+            ws.write_row(i, 0, [_excel_cell(v) for v in row])
+        wb.close()
+    elif HAS_OPENPYXL:
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet(sheet_name)
+        ws.append([str(c) for c in df.columns])
+        for row in df.itertuples(index=False, name=None):
+            ws.append([_openpyxl_cell(v) for v in row])
+        wb.save(buf)
+    else:
+        raise RuntimeError("Excel export needs XlsxWriter or openpyxl.")
+    return buf.getvalue()
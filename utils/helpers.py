@@ -1,4 +1,22 @@
+import os
 import re
+from dotenv import load_dotenv
+
+# Compiled once at import (normalize() runs per comparison)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# -------------------------------------------------------------
+# LOAD .env ONLY WHEN NEEDED
+# -------------------------------------------------------------
+def load_env(*names):
+    """
+    Read .env only if one of the given environment variables is not set
+    yet (e.g. not provided by Docker), so a fully configured process skips
+    parsing the file.
+    """
+    if not all(os.getenv(name) for name in names):
+        load_dotenv()
+
 
 # -------------------------------------------------------------
 # SANITIZE STRINGS (removes NUL bytes, trims spaces)
@@ -17,7 +35,7 @@ def sanitize(value):
 def normalize(text):
     if not text:
         return ""
-    return re.sub(r"\s+", "", text.lower()).strip()
+    return _WHITESPACE_RE.sub("", text.lower())
 
 
 # -------------------------------------------------------------